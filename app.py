@@ -1,11 +1,20 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import sqlite3
+import hmac
+import hashlib
+import logging
+import threading
+import contextlib
+import atexit
+import queue
 import random
 import time
 import datetime
 import pandas as pd
-from streamlit_autorefresh import st_autorefresh
-# import math # 더 이상 필요 없으므로 삭제
+import math
+
+logger = logging.getLogger(__name__)
 
 # --- 시간대 설정 (한국시간) ---
 KST = datetime.timezone(datetime.timedelta(hours=9))
@@ -13,13 +22,158 @@ KST = datetime.timezone(datetime.timedelta(hours=9))
 def now_kst():
     return datetime.datetime.now(KST)
 
-# --- 1. 설정 및 데이터베이스 초기화 (수정 없음) ---
-def setup_database():
-    conn = sqlite3.connect('lottery_data_v2.db', check_same_thread=False)
+def to_kst(value):
+    # DB에서 읽은 TIMESTAMP(문자열/naive datetime)를 KST aware datetime으로
+    if isinstance(value, str): value = datetime.datetime.fromisoformat(value)
+    if hasattr(value, 'tzinfo') and value.tzinfo is None: value = value.replace(tzinfo=KST)
+    return value
+
+# 같은 프로세스의 생성은 next_due를 바로 초기화하고, 다른 프로세스가 DB에 직접 넣은 예약 추첨도 최소 이 간격마다 다시 확인
+NEXT_DUE_RECHECK = datetime.timedelta(seconds=5)
+# 백그라운드 예약 검사 스레드의 주기(초)
+WATCH_INTERVAL = 2
+# 목록 영역 변경 확인 간격 범위(초): 다음 예정 시각에 맞춰 깨어나되 최소 1초, 최대 60초 (예정된 것이 없어도 60초마다)
+# (남은 시간 표시는 브라우저에서 매초 갱신하므로 서버 재실행은 실제 추첨 시점 반영용)
+REFRESH_MIN, REFRESH_MAX = 1, 60
+# 로그 탭에 기본으로 보여줄 최신 로그 수
+LOG_PAGE = 50
+
+# --- SQL 문 (항상 같은 문자열 객체를 넘겨 sqlite3 prepared statement 캐시를 재사용) ---
+SQL_INSERT_LOG = "INSERT INTO lottery_logs (lottery_id, log_message, log_timestamp) VALUES (?, ?, ?)"
+# 아직 당첨되지 않은 참가자 (p: participants 별칭)
+_NOT_WON = "NOT EXISTS (SELECT 1 FROM winners w WHERE w.lottery_id = p.lottery_id AND w.winner_name = p.name)"
+SQL_CANDIDATES = f"SELECT p.name FROM participants p WHERE p.lottery_id = ? AND {_NOT_WON} GROUP BY p.name ORDER BY MIN(p.id)"
+SQL_SAMPLE_CANDIDATES = f"SELECT p.name FROM participants p WHERE p.lottery_id = ? AND {_NOT_WON} ORDER BY RANDOM() LIMIT ?"
+# 회차 증가와 완료 표시를 한 문장으로 (재추첨이면 이미 completed라 상태는 그대로)
+SQL_NEXT_ROUND = "UPDATE lotteries SET next_round = next_round + 1, status = 'completed' WHERE id = ?"
+# 방금 올린 카운터에서 이번 회차 번호 (UPDATE ... RETURNING은 SQLite 3.35 이상이라 같은 트랜잭션에서 따로 조회)
+SQL_CURRENT_ROUND = "SELECT next_round - 1 FROM lotteries WHERE id = ?"
+SQL_INSERT_WINNER = "INSERT INTO winners (lottery_id, winner_name, draw_round) VALUES (?, ?, ?)"
+SQL_CLAIM_LOTTERY = "UPDATE lotteries SET status = 'drawing' WHERE id = ? AND status = 'scheduled'"
+SQL_RELEASE_LOTTERY = "UPDATE lotteries SET status = 'scheduled' WHERE id = ? AND status = 'drawing'"
+SQL_NEXT_DUE = "SELECT MIN(draw_time) FROM lotteries WHERE status = 'scheduled'"
+SQL_DUE_LOTTERIES = "SELECT id, num_winners FROM lotteries WHERE status = 'scheduled' AND draw_time <= ?"
+SQL_DUE_REDRAWS = "SELECT id, lottery_id, num_winners, candidates FROM scheduled_redraws WHERE execution_time <= ?"
+SQL_DELETE_REDRAW = "DELETE FROM scheduled_redraws WHERE id = ?"
+SQL_LIST_LOTTERIES = "SELECT id, title, status FROM lotteries ORDER BY id DESC LIMIT ? OFFSET ?"
+SQL_LOTTERY = "SELECT l.*, (SELECT COUNT(*) FROM participants WHERE lottery_id = l.id) AS n_part, l.next_round - 1 AS max_round FROM lotteries l WHERE l.id = ?"
+SQL_WINNER_ROUNDS = "SELECT draw_round, GROUP_CONCAT(winner_name, char(10)) FROM (SELECT draw_round, winner_name FROM winners WHERE lottery_id = ? ORDER BY id) GROUP BY draw_round ORDER BY draw_round"
+SQL_PARTICIPANTS = "SELECT name AS 이름 FROM participants WHERE lottery_id = ?"
+# 최신 N개만 (lottery_id, id) 인덱스 역순 범위 스캔으로 가져와 시간순으로 다시 정렬, LIMIT -1이면 전체
+SQL_LOGS = "SELECT log_timestamp, 내용 FROM (SELECT id, log_timestamp, log_message AS 내용 FROM lottery_logs WHERE lottery_id = ? ORDER BY id DESC LIMIT ?) ORDER BY id"
+SQL_REDRAW_TASKS = "SELECT execution_time, num_winners FROM scheduled_redraws WHERE lottery_id=?"
+SQL_INSERT_REDRAW = "INSERT INTO scheduled_redraws (lottery_id, execution_time, num_winners, candidates) VALUES (?, ?, ?, ?)"
+SQL_DELETE_LOTTERY = "DELETE FROM lotteries WHERE id=?"
+SQL_DELETE_CHILDREN = tuple(f"DELETE FROM {tbl} WHERE lottery_id=?" for tbl in ('participants', 'winners', 'lottery_logs', 'scheduled_redraws'))
+SQL_INSERT_LOTTERY = "INSERT INTO lotteries (title, draw_time, num_winners, status) VALUES (?, ?, ?, 'scheduled')"
+SQL_INSERT_PARTICIPANT = "INSERT INTO participants (lottery_id, name) VALUES (?, ?)"
+# 쓰기가 일어나면 바뀌는 값들: 조회 캐시의 키로 사용
+SQL_DATA_VERSION = "SELECT (SELECT IFNULL(MAX(id), 0) FROM lotteries), (SELECT COUNT(*) FROM lotteries), (SELECT IFNULL(MAX(id), 0) FROM winners), (SELECT IFNULL(MAX(id), 0) FROM lottery_logs), (SELECT IFNULL(MAX(id), 0) FROM scheduled_redraws), (SELECT COUNT(*) FROM scheduled_redraws)"
+SQL_NEXT_PENDING = "SELECT MIN(t) FROM (SELECT MIN(draw_time) AS t FROM lotteries WHERE status = 'scheduled' UNION ALL SELECT MIN(execution_time) FROM scheduled_redraws)"
+
+# --- 1. 설정 및 데이터베이스 초기화 ---
+DB_PATH = 'lottery_data_v2.db'
+# 화면 조회용 읽기 전용 연결 수 (WAL에서는 쓰기 중에도 동시에 읽을 수 있음)
+READER_POOL_SIZE = 4
+# 풀이 모두 사용 중일 때 반납을 기다리는 최대 시간(초), 넘으면 임시 연결을 따로 엶
+READER_WAIT = 2
+# 연결마다 따로 적용해야 하는 설정 (쓰기/읽기 연결 공통): 페이지 캐시 64MB, 임시 테이블은 메모리, 256MB mmap
+CONN_PRAGMAS = ("PRAGMA busy_timeout=5000;", "PRAGMA temp_store=MEMORY;", "PRAGMA cache_size=-65536;", "PRAGMA mmap_size=268435456;")
+
+class WriterConnection(sqlite3.Connection):
+    # 쓰기 연결이 자기 쓰기 잠금과 읽기 전용 연결 풀을 함께 들고 다님
+    # (캐시가 지워져 새 연결로 바뀌어도, 이전 연결을 쥔 코드는 이전 연결의 잠금으로 직렬화됨)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_lock = threading.RLock(); self.readers = queue.Queue()
+
+@st.cache_resource
+def get_conn():
+    # 프로세스당 한 번: 쓰기 연결 + 쓰기 잠금 + 읽기 연결 풀 + 예약 검사 스레드를 한 묶음으로 만들어 모든 rerun/세션이 재사용
+    # (Clear cache로 지워지면 묶음 전체가 새로 만들어지고, 이전 스레드는 이전 연결들을 닫고 종료)
+    # isolation_level=None: 암묵적 트랜잭션 없이, 쓰기는 write_tx()의 BEGIN IMMEDIATE/COMMIT으로만 묶음
+    conn = sqlite3.connect(DB_PATH, factory=WriterConnection, check_same_thread=False, cached_statements=256, isolation_level=None)
+    _init_schema(conn)
+    # 화면 조회용 읽기 전용 연결은 스키마를 준비한 뒤에 엶
+    for _ in range(READER_POOL_SIZE): conn.readers.put(_open_reader())
+    atexit.register(_optimize_on_exit, conn)
+    threading.Thread(target=_watch_scheduled, args=(conn,), name="lottery-watcher", daemon=True).start()
+    return conn
+
+def _optimize_on_exit(conn):
+    # 종료 시 그동안의 쿼리 패턴을 바탕으로 필요한 통계만 갱신 (삭제/재추첨 후에도 플래너가 인덱스를 잘 고르도록)
+    # 다른 스레드가 아직 트랜잭션 중일 수 있으므로 쓰기 잠금을 잡고, 실패해도(이미 닫힌 연결 등) 종료는 막지 않음
+    with conn.write_lock:
+        try: conn.execute("PRAGMA optimize")
+        except sqlite3.Error: pass
+
+def _open_reader():
+    rc = sqlite3.connect(f'file:{DB_PATH}?mode=ro', uri=True, check_same_thread=False, cached_statements=256, isolation_level=None)
+    for pragma in CONN_PRAGMAS: rc.execute(pragma)
+    return rc
+
+@contextlib.contextmanager
+def read_conn():
+    # 조회 하나(로더 하나) 동안만 풀에서 읽기 연결을 빌려 쓰고 반납
+    # 모두 사용 중이면 READER_WAIT초까지 기다리고, 그래도 없으면 임시 연결을 열어 쓰고 닫음 (세션이 많아도 멈추지 않음)
+    pool = get_conn().readers
+    try:
+        rc = pool.get(timeout=READER_WAIT)
+    except queue.Empty:
+        rc = _open_reader()
+        try:
+            yield rc
+        finally:
+            rc.close()
+        return
+    try:
+        yield rc
+    finally:
+        pool.put(rc)
+
+@contextlib.contextmanager
+def write_tx(conn):
+    # 쓰기 잠금을 먼저 잡고(BEGIN IMMEDIATE) 블록 전체를 커밋 한 번으로, 예외 시 롤백
+    # 이미 트랜잭션 안이면 바깥 트랜잭션에 합류
+    # 모든 세션과 백그라운드 스레드가 연결 하나를 공유하므로, 쓰기 트랜잭션끼리 섞이지 않게 연결의 잠금으로 직렬화
+    with conn.write_lock:
+        if conn.in_transaction:
+            yield conn.cursor(); return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+        conn.execute("COMMIT")
+
+@st.cache_resource
+def _sweep_state():
+    # 프로세스 전체가 공유: next_due = 이 시각 전에는 예약 추첨 조회를 건너뜀
+    return {'next_due': None}
+
+# 시작할 때 VACUUM으로 incremental auto_vacuum 전환까지 하는 기존 DB의 최대 페이지 수 (4KB 페이지 기준 약 10MB)
+AUTO_VACUUM_CONVERT_MAX_PAGES = 2560
+
+def _init_schema(conn):
     c = conn.cursor()
+    # 삭제로 생긴 빈 페이지를 나중에 조금씩 돌려받을 수 있도록 incremental auto_vacuum (새 DB는 첫 테이블/WAL 전에 설정해야 적용됨)
+    # 기존 DB 전환은 파일 전체를 다시 쓰는 VACUUM이 필요하므로 작은 DB만 여기서 하고, 큰 DB는 시작을 막지 않도록 경고만 남김
+    if c.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        pages = c.execute("PRAGMA page_count").fetchone()[0]
+        if pages <= AUTO_VACUUM_CONVERT_MAX_PAGES:
+            c.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            if pages: c.execute("VACUUM")
+        else: logger.warning("DB가 커서 incremental auto_vacuum 전환을 건너뜀 (원하면 앱을 멈춘 뒤 'PRAGMA auto_vacuum=INCREMENTAL; VACUUM;'을 한 번 실행)")
+    # WAL: 자동 새로고침 읽기와 추첨 쓰기가 서로 막지 않도록
+    # (DB 파일에 유지되는 설정이라 이미 wal이면 건너뜀, 옆에 -wal/-shm 파일이 생김)
+    # 파일 시스템에 따라 WAL을 쓸 수 없을 수도 있으므로 실제로 wal이 되었는지 반환값으로 확인
+    wal = c.execute("PRAGMA journal_mode").fetchone()[0] == 'wal' or c.execute("PRAGMA journal_mode=WAL;").fetchone()[0] == 'wal'
+    # synchronous=NORMAL은 WAL에서만 안전 (롤백 저널로 남았으면 기본값 FULL 유지)
+    if wal: c.execute("PRAGMA synchronous=NORMAL;")
+    for pragma in CONN_PRAGMAS: c.execute(pragma)
     c.execute("PRAGMA foreign_keys = ON;")
     c.execute('''
-        CREATE TABLE IF NOT EXISTS lotteries (id INTEGER PRIMARY KEY, title TEXT NOT NULL, draw_time TIMESTAMP, num_winners INTEGER, status TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+        CREATE TABLE IF NOT EXISTS lotteries (id INTEGER PRIMARY KEY, title TEXT NOT NULL, draw_time TIMESTAMP, num_winners INTEGER, status TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, next_round INTEGER DEFAULT 1)
     ''')
     c.execute('''
         CREATE TABLE IF NOT EXISTS participants (id INTEGER PRIMARY KEY, lottery_id INTEGER, name TEXT NOT NULL, FOREIGN KEY (lottery_id) REFERENCES lotteries (id) ON DELETE CASCADE)
@@ -36,229 +190,397 @@ def setup_database():
             num_winners INTEGER NOT NULL, candidates TEXT NOT NULL, FOREIGN KEY (lottery_id) REFERENCES lotteries(id) ON DELETE CASCADE
         )
     ''')
-    conn.commit()
-    return conn
+    # 예전 DB에는 회차 카운터가 없으므로 추가하고 기존 당첨 회차로 채움
+    if 'next_round' not in [r[1] for r in c.execute("PRAGMA table_info(lotteries)")]:
+        c.execute("ALTER TABLE lotteries ADD COLUMN next_round INTEGER DEFAULT 1")
+        c.execute("UPDATE lotteries SET next_round = COALESCE((SELECT MAX(draw_round) FROM winners WHERE lottery_id = lotteries.id), 0) + 1")
+    # lottery_id 조회 및 예약 추첨 검사용 인덱스
+    c.execute("CREATE INDEX IF NOT EXISTS idx_participants_lottery ON participants(lottery_id)")
+    # 당첨자 표시 쿼리를 인덱스만으로 처리하도록 winner_name까지 포함
+    c.execute("CREATE INDEX IF NOT EXISTS idx_winners_lottery_round_name ON winners(lottery_id, draw_round, winner_name)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_logs_lottery_id ON lottery_logs(lottery_id, id)")
+    # 예약 추첨 검사는 scheduled 상태만 보므로 그 행만 담은 부분 인덱스 (완료된 추첨이 쌓여도 크기가 늘지 않음)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lotteries_scheduled_due ON lotteries(draw_time) WHERE status = 'scheduled'")
+    # 목록 페이지(id 역순, LIMIT/OFFSET)가 테이블 행을 읽지 않고 인덱스만으로 처리되도록 필요한 컬럼만 담은 커버링 인덱스
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lotteries_board ON lotteries(id, title, status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_redraws_lottery ON scheduled_redraws(lottery_id)")
+    # 플래너 통계가 없으면 한 번만 수집
+    if not c.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        c.execute("ANALYZE")
+
+@st.cache_resource
+def _admin_password_digest():
+    # secrets.toml은 프로세스당 한 번만 읽고 평문 대신 SHA-256 digest만 보관, 설정되지 않았으면 None
+    pw = str(st.secrets.get('admin', {}).get('password') or '')
+    return hashlib.sha256(pw.encode()).digest() if pw else None
 
-# --- 2. 헬퍼 및 로직 함수 (수정 없음) ---
+def check_admin_password(pw):
+    # 비밀번호가 설정되지 않았으면 항상 실패, 같은 길이의 digest끼리 상수 시간 비교 (길이도 드러나지 않음)
+    expected = _admin_password_digest()
+    return expected is not None and hmac.compare_digest(hashlib.sha256(pw.encode()).digest(), expected)
+
+# --- 2. 헬퍼 및 로직 함수 (추첨 실행, 예약 추첨/재추첨 검사) ---
 def add_log(conn, lottery_id, message):
+    # write_tx() 안에서 부르면 호출한 쪽 트랜잭션과 함께 커밋됨
     c = conn.cursor()
-    c.execute("INSERT INTO lottery_logs (lottery_id, log_message, log_timestamp) VALUES (?, ?, ?)", (lottery_id, message, now_kst()))
-    conn.commit()
+    c.execute(SQL_INSERT_LOG, (lottery_id, message, now_kst()))
 
-def run_draw(conn, lottery_id, num_to_draw, candidates):
-    actual = min(num_to_draw, len(candidates))
-    if actual <= 0: return []
-    winners = random.sample(candidates, k=actual)
+def fetch_candidates(conn, lottery_id):
+    # 아직 당첨되지 않은 참가자만, 이름 중복 없이 입력 순서대로 (이전 당첨자 제외를 SQL anti-join으로)
     c = conn.cursor()
-    c.execute("SELECT MAX(draw_round) FROM winners WHERE lottery_id = ?", (lottery_id,))
-    prev = c.fetchone()[0] or 0
-    current_round = prev + 1
-    for w in winners:
-        c.execute("INSERT INTO winners (lottery_id, winner_name, draw_round) VALUES (?, ?, ?)",(lottery_id, w, current_round))
-    if current_round == 1:
-        c.execute("UPDATE lotteries SET status = 'completed' WHERE id = ?", (lottery_id,))
-    conn.commit()
-    add_log(conn, lottery_id, f"{current_round}회차 추첨 진행. (당첨자: {', '.join(winners)})")
-    return winners
+    c.execute(SQL_CANDIDATES, (lottery_id,))
+    return [r[0] for r in c.fetchall()]
 
-def check_and_run_scheduled_draws(conn):
+def run_draw(conn, lottery_id, num_to_draw, candidates=None):
     c = conn.cursor()
-    now = now_kst()
-    c.execute("SELECT id, num_winners FROM lotteries WHERE status = 'scheduled' AND draw_time <= ?", (now,))
-    for lottery_id, num_winners in c.fetchall():
-        c.execute("SELECT name FROM participants WHERE lottery_id = ?", (lottery_id,))
-        participants = [r[0] for r in c.fetchall()]
-        if participants:
-            winners = run_draw(conn, lottery_id, num_winners, participants)
-            if winners:
-                st.session_state[f'celebrated_{lottery_id}'] = True
-
-def check_and_run_scheduled_redraws(conn):
-    c = conn.cursor()
-    now = now_kst()
-    c.execute("SELECT id, lottery_id, num_winners, candidates FROM scheduled_redraws WHERE execution_time <= ?", (now,))
-    tasks_to_run = c.fetchall()
+    if candidates is None:
+        # 후보를 따로 지정하지 않으면 미당첨 참가자 중에서 SQLite가 바로 표본 추출 (전체 명단을 파이썬으로 가져오지 않음)
+        c.execute(SQL_SAMPLE_CANDIDATES, (lottery_id, num_to_draw))
+        winners = [r[0] for r in c.fetchall()]
+    else:
+        actual = min(num_to_draw, len(candidates))
+        winners = random.sample(candidates, k=actual) if actual > 0 else []
+    if not winners: return []
+    with write_tx(conn) as c:
+        # 회차는 lotteries의 카운터를 올린 뒤 같은 트랜잭션에서 바로 읽음 (winners에서 MAX 집계하지 않음, 완료 표시도 같은 UPDATE)
+        c.execute(SQL_NEXT_ROUND, (lottery_id,))
+        current_round = c.execute(SQL_CURRENT_ROUND, (lottery_id,)).fetchone()[0]
+        c.executemany(SQL_INSERT_WINNER, [(lottery_id, w, current_round) for w in winners])
+        add_log(conn, lottery_id, f"{current_round}회차 추첨 진행. (당첨자: {', '.join(winners)})")
+    st.cache_data.clear()
+    return winners
+
+def draw_scheduled(conn, lottery_id, num_winners):
+    with write_tx(conn) as wc:
+        # scheduled 상태를 먼저 가져간 쪽만 추첨 (run_draw와 같은 트랜잭션, 추첨하지 못하면 되돌림)
+        if wc.execute(SQL_CLAIM_LOTTERY, (lottery_id,)).rowcount == 0: return
+        if not run_draw(conn, lottery_id, num_winners): wc.execute(SQL_RELEASE_LOTTERY, (lottery_id,))
+
+def check_and_run_scheduled_draws(conn, now):
+    # 다음 예정 시각 전에는 DB를 건드리지 않음 (한 번 조회한 값을 프로세스에서 공유)
+    state = _sweep_state()
+    next_due = state['next_due']
+    if next_due is not None and now < next_due: return
+    # 공유 연결을 여러 스레드가 쓰므로 조회도 쓰기 잠금 안에서
+    with conn.write_lock:
+        earliest = conn.execute(SQL_NEXT_DUE).fetchone()[0]
+        due = conn.execute(SQL_DUE_LOTTERIES, (now,)).fetchall() if earliest is not None and to_kst(earliest) <= now else []
+    if not due:
+        state['next_due'] = now + NEXT_DUE_RECHECK if earliest is None else min(to_kst(earliest), now + NEXT_DUE_RECHECK)
+        return
+    state['next_due'] = None
+    for lottery_id, num_winners in due: draw_scheduled(conn, lottery_id, num_winners)
+
+def check_and_run_scheduled_redraws(conn, now):
+    with conn.write_lock: tasks_to_run = conn.execute(SQL_DUE_REDRAWS, (now,)).fetchall()
     for task_id, lottery_id, num_winners, candidates_str in tasks_to_run:
-        candidates = candidates_str.split(',')
-        if candidates:
-            winners = run_draw(conn, lottery_id, num_winners, candidates)
-            if winners: st.session_state[f'celebrated_{lottery_id}'] = True
-        c.execute("DELETE FROM scheduled_redraws WHERE id = ?", (task_id,)); conn.commit()
+        with write_tx(conn) as wc:
+            # 예약 작업을 먼저 지운 쪽만 실행 (같은 재추첨이 두 번 돌지 않도록, 삭제는 추첨과 함께 커밋)
+            if wc.execute(SQL_DELETE_REDRAW, (task_id,)).rowcount == 0: continue
+            candidates = candidates_str.split(',')
+            if candidates: run_draw(conn, lottery_id, num_winners, candidates)
+        st.cache_data.clear()
+
+def _watch_scheduled(conn):
+    # 화면을 보는 세션이 없어도 예약 추첨/재추첨이 제시간에 실행되도록 프로세스당 한 스레드가 주기적으로 검사
+    # (세션 상태를 건드리지 않는 함수만 호출, 어떤 오류든 기록만 하고 다음 주기에 다시 시도: 스레드가 죽으면 재시작되지 않음)
+    # 캐시가 지워져 get_conn()이 다른 연결을 돌려주면 새 묶음의 스레드에 맡기고, 이전 연결들을 닫은 뒤 종료
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        if get_conn() is not conn: break
+        try:
+            now = now_kst()
+            check_and_run_scheduled_draws(conn, now)
+            check_and_run_scheduled_redraws(conn, now)
+        except Exception:
+            logger.exception("예약 추첨 검사 실패")
+    with conn.write_lock:
+        while not conn.readers.empty(): conn.readers.get_nowait().close()
+        conn.close()
+
+# --- 조회 함수 (자동 새로고침마다 같은 쿼리를 반복하지 않도록 캐시, 쓰기 후 st.cache_data.clear(), 추첨별 캐시는 항목 수 상한) ---
+# 캐시를 놓쳤을 때만 read_conn()으로 읽기 연결을 잠깐 빌림
+# version: data_version() 값. 데이터가 그대로면 캐시 적중, 바뀌면 새로 조회
+def data_version(conn):
+    return conn.execute(SQL_DATA_VERSION).fetchone()
+
+def fetch_df(conn, sql, params=()):
+    # 작은 결과용: pd.read_sql의 범용 처리 없이 커서 결과로 바로 DataFrame 생성
+    cur = conn.execute(sql, params)
+    return pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_lotteries(page, per_page, version):
+    # 목록은 행 단위로만 그리므로 DataFrame 대신 (id, title, status) 튜플 리스트, 현재 페이지 분량만 조회
+    with read_conn() as rc: return rc.execute(SQL_LIST_LOTTERIES, (per_page, (page - 1) * per_page)).fetchall()
+
+@st.cache_data(ttl=60, max_entries=256, show_spinner=False)
+def _load_lottery(lottery_id, version):
+    # 참가자 수/최종 회차는 서브쿼리로 함께 가져와 별도 조회를 없앰
+    with read_conn() as rc: df = fetch_df(rc, SQL_LOTTERY, (lottery_id,))
+    # 타입 변환은 조회할 때 한 번만 (렌더링 중 캐스팅/파싱 없음)
+    rows = df.to_dict('records')
+    for r in rows: r['draw_time'] = to_kst(r['draw_time'])
+    return rows
+
+@st.cache_data(ttl=60, max_entries=256, show_spinner=False)
+def _load_winner_rounds(lottery_id, version):
+    # 회차별 당첨자 목록을 SQLite GROUP_CONCAT으로 묶어서 받음 (이름은 줄 단위로 입력되므로 줄바꿈 구분자는 안전)
+    with read_conn() as rc: rows = rc.execute(SQL_WINNER_ROUNDS, (lottery_id,)).fetchall()
+    return [(rnd, names.split('\n')) for rnd, names in rows]
+
+# 당첨자 태그: 이름마다 f-string을 만들지 않고 "닫는 태그 + 구분자 + 여는 태그"로 한 번에 join
+# 스타일은 태그마다 인라인으로 반복하지 않고 페이지에 한 번 넣는 .wtag 클래스로
+WINNER_TAG_CSS = "<style>.wtag{background-color:#E8F5E9; color:#1E8E3E; border-radius:5px; padding:5px 10px; font-weight:bold;}</style>"
+_TAG_OPEN = "<span class='wtag'>"
+_TAG_SEP = "</span> &nbsp; " + _TAG_OPEN
+
+@st.cache_data(show_spinner=False)
+def _winner_html(lottery_id, max_round):
+    # 지난 회차 당첨자는 바뀌지 않으므로 (추첨, 최종 회차) 단위로 완성된 마크다운을 캐시 (재추첨 시 max_round가 바뀌어 새로 생성)
+    blocks = []
+    for rnd, names in _load_winner_rounds(lottery_id, max_round):
+        label = '1회차' if rnd == 1 else f"{rnd}회차 (재추첨)"
+        tags = _TAG_OPEN + _TAG_SEP.join(names) + "</span>"
+        blocks.append(f"#### 🏆 {label} 당첨자\n\n<p style='text-align:center; font-size:20px;'>{tags}</p>")
+    return "\n\n".join(blocks)
+
+def _countdown_html(deadline):
+    # 남은 시간은 브라우저가 1초마다 직접 계산 (시계를 돌리려고 서버 스크립트를 다시 실행하지 않음)
+    return f"""<div id='cd' style='font-family:sans-serif; font-size:15px; color:#31333F;'></div>
+<script>
+const end = {int(deadline.timestamp() * 1000)}, el = document.getElementById('cd'), pad = n => String(n).padStart(2, '0');
+function tick() {{
+  const s = Math.floor((end - Date.now()) / 1000);
+  if (s <= 0) {{ el.innerText = '예정 시간이 지났습니다. 곧 자동 진행됩니다...'; return; }}
+  const d = Math.floor(s / 86400), h = Math.floor(s % 86400 / 3600);
+  el.innerText = '남은 시간: ' + (d ? d + (d > 1 ? ' days, ' : ' day, ') : '') + h + ':' + pad(Math.floor(s % 3600 / 60)) + ':' + pad(s % 60);
+  setTimeout(tick, 1000 - Date.now() % 1000);
+}}
+tick();
+</script>"""
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _load_candidates(lottery_id, max_round):
+    # 참가자는 생성 후 바뀌지 않으므로 재추첨 후보는 당첨 회차가 늘 때만 달라짐 (max_round를 워터마크로 캐시)
+    with read_conn() as rc: return fetch_candidates(rc, lottery_id)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _load_participants(lottery_id):
+    # 참가자 명단은 생성 후 바뀌지 않으므로 추첨별로 한 번만 (version에 묶이지 않음)
+    with read_conn() as rc: return fetch_df(rc, SQL_PARTICIPANTS, (lottery_id,))
+
+@st.cache_data(ttl=60, max_entries=256, show_spinner=False)
+def _load_logs(lottery_id, limit, version):
+    with read_conn() as rc: df = fetch_df(rc, SQL_LOGS, (lottery_id, limit))
+    # 시각 포맷은 SQLite strftime을 행마다 부르지 않고 pandas로 한 번에 (KST 표시)
+    df['시간'] = pd.to_datetime(df['log_timestamp'], format='ISO8601', utc=True).dt.tz_convert(KST).dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df[['시간', '내용']]
+
+@st.cache_data(ttl=60, max_entries=256, show_spinner=False)
+def _load_redraw_tasks(lottery_id, version):
+    with read_conn() as rc: df = fetch_df(rc, SQL_REDRAW_TASKS, (lottery_id,))
+    # 시각 변환/포맷은 행마다 하지 않고 컬럼 단위로 한 번에
+    df['execution_time'] = pd.to_datetime(df['execution_time'], format='ISO8601', utc=True).dt.tz_convert(KST)
+    df['time_str'] = df['execution_time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df
 
 # --- 3. Streamlit UI 구성 ---
+def _refresh_every(conn, now):
+    # 다음 예정 추첨/재추첨 시각에 맞춰 깨어날 간격(초, 1~60초), 예정된 것이 없으면 None (자동 새로고침 안 함)
+    next_pending = conn.execute(SQL_NEXT_PENDING).fetchone()[0]
+    if next_pending is None: return None
+    return max(REFRESH_MIN, min(REFRESH_MAX, math.ceil((to_kst(next_pending) - now).total_seconds())))
+
+def watch_board(armed):
+    # run_every로 이 작은 fragment만 깨어나 버전만 확인 (화면은 다시 그리지 않음)
+    # 백그라운드 추첨 등으로 데이터가 바뀌었거나 다음 예정 시각이 달라졌을 때만 앱 전체를 다시 실행
+    with read_conn() as rconn:
+        version = data_version(rconn); every = _refresh_every(rconn, now_kst())
+    if version != st.session_state.get('board_version') or (every is None) != (armed is None) or (every is not None and abs(every - armed) > 1): st.rerun()
+
+def render_board(conn):
+    # 목록/상세 영역만 담당. 이 영역 안의 버튼은 이 부분만 다시 실행되고 관리자 메뉴는 다시 그리지 않음
+    # 화면 조회는 조회마다 읽기 전용 연결을 잠깐 빌려서(_load_*), 추첨/삭제 등 쓰기는 conn으로
+    # 현재 시각은 실행마다 한 번만 구해 남은 시간/입력 기본값에 같이 사용 (로그 시각만 기록 시점에 따로)
+    # 예약 추첨/재추첨은 백그라운드 스레드(_watch_scheduled)가 실행
+    now = now_kst()
+    with read_conn() as rconn: version = data_version(rconn)
+    # 이 화면이 보여주는 데이터 버전 (watch_board가 비교)
+    st.session_state.board_version = version
+
+    # 상세 보기 로직
+    if st.session_state.view_mode == 'detail' and st.session_state.selected_lottery_id is not None:
+        if st.button("🔙 목록으로 돌아가기"):
+            st.session_state.view_mode = 'list'; st.session_state.selected_lottery_id = None; st.rerun()
+        
+        lid = st.session_state.selected_lottery_id
+        try:
+            sel_row = _load_lottery(lid, version)[0]
+            title, status, draw_time = sel_row['title'], sel_row['status'], sel_row['draw_time']
+            # 보고 있는 동안 새 회차가 추첨되었으면(백그라운드 검사/다른 세션 포함) 한 번 축하
+            seen_round = st.session_state.get(f'seen_round_{lid}')
+            st.session_state[f'seen_round_{lid}'] = sel_row['max_round']
+
+            with st.container(border=True):
+                st.header(f"✨ {title}")
+                if status == 'completed':
+                    st.success(f"**추첨 완료!** ({draw_time.strftime('%Y-%m-%d %H:%M:%S %Z')})")
+                    st.markdown(_winner_html(lid, sel_row['max_round']), unsafe_allow_html=True)
+                    if seen_round is not None and sel_row['max_round'] > seen_round: st.balloons()
+                else:
+                    diff = draw_time - now
+                    if diff.total_seconds() > 0:
+                        st.info(f"**추첨 예정:** {draw_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+                        countdown = _countdown_html(draw_time)
+                        if hasattr(st, 'iframe'): st.iframe(countdown, height=30)
+                        else: components.html(countdown, height=30)
+                    else: st.warning("예정 시간이 지났습니다. 곧 자동 진행됩니다...")
+                
+                redraw_tasks = _load_redraw_tasks(lid, version)
+                for time_str, n in zip(redraw_tasks['time_str'], redraw_tasks['num_winners']):
+                    st.info(f"**재추첨 예약됨:** {time_str} ({n}명)")
+                
+                # st.tabs는 숨겨진 탭 내용까지 매번 실행하므로, 선택한 섹션만 조회/렌더
+                tab_labels = [f"참가자 명단 ({sel_row['n_part']}명)", "📜 추첨 로그", "👑 관리"]
+                tab = st.radio("보기", range(len(tab_labels)), format_func=tab_labels.__getitem__, key=f"detail_tab_{lid}", horizontal=True, label_visibility="collapsed")
+                if tab == 0:
+                    part_df = _load_participants(lid)
+                    st.dataframe(part_df, use_container_width=True, height=200)
+                elif tab == 1:
+                    show_all = st.checkbox("이전 로그 모두 보기", key=f"detail_all_logs_{lid}")
+                    log_df = _load_logs(lid, -1 if show_all else LOG_PAGE, version)
+                    st.dataframe(log_df, use_container_width=True, height=200)
+                else:
+                    st.subheader("이 추첨 관리하기")
+                    if not st.session_state.admin_auth:
+                        st.warning("관리자 기능을 사용하려면 오른쪽 메뉴에서 인증하세요.")
+                    else:
+                        if status == 'completed':
+                            st.write("**재추첨**")
+                            cand = _load_candidates(lid, sel_row['max_round'])
+                            if cand:
+                                redraw_type = st.radio("재추첨 방식", ["즉시 추첨", "예약 추첨"], key=f"detail_redraw_type_{lid}", horizontal=True)
+                                redraw_time = now
+                                if redraw_type == "예약 추첨":
+                                    date = st.date_input("날짜", value=now.date(), key=f"detail_redraw_date_{lid}")
+                                    default_tm = st.session_state.get(f'detail_redraw_time_{lid}', (now + datetime.timedelta(minutes=5)).time())
+                                    tm = st.time_input("시간", value=default_tm, key=f"detail_redraw_time_{lid}", step=datetime.timedelta(minutes=1))
+                                    redraw_time = datetime.datetime.combine(date, tm, tzinfo=KST)
+                                chosen = st.multiselect("재추첨 후보자", cand, default=cand, key=f"detail_redraw_cand_{lid}")
+                                num_r = st.number_input("추첨 인원", 1, len(chosen) if chosen else 1, 1, key=f"detail_redraw_num_{lid}")
+                                if st.button("🚀 재추첨 실행/예약", key=f"detail_redraw_btn_{lid}", type="primary"):
+                                    if not chosen: st.warning("후보자를 선택하세요.")
+                                    elif redraw_type == "예약 추첨" and redraw_time <= now: st.error("예약 시간은 현재 이후여야 합니다.")
+                                    else:
+                                        if redraw_type == "즉시 추첨":
+                                            run_draw(conn, lid, num_r, chosen); st.success("재추첨 완료"); time.sleep(1); st.rerun()
+                                        else:
+                                            candidates_str = ",".join(chosen)
+                                            with write_tx(conn) as c:
+                                                c.execute(SQL_INSERT_REDRAW, (lid, redraw_time, num_r, candidates_str))
+                                                add_log(conn, lid, f"재추첨 예약됨 ({len(chosen)}명 대상)")
+                                            st.cache_data.clear()
+                                            st.success("재추첨이 예약되었습니다."); time.sleep(1); st.rerun()
+                            else: st.warning("재추첨 후보가 없습니다.")
+                        else: st.info("완료된 추첨만 재추첨할 수 있습니다.")
+                        st.markdown("---")
+                        st.write("**추첨 삭제**")
+                        if st.button("삭제", key=f"detail_delete_btn_{lid}"): st.session_state.delete_confirm_id = lid
+                        if st.session_state.delete_confirm_id == lid:
+                            st.warning("정말 삭제하시겠습니까?")
+                            if st.button("예, 삭제합니다", key=f"detail_confirm_del_btn_{lid}", type="primary"):
+                                # 자식 테이블을 인덱스로 직접 지운 뒤 본체 삭제 (CASCADE 행 단위 처리 대신, 한 트랜잭션)
+                                with write_tx(conn) as c:
+                                    for sql in SQL_DELETE_CHILDREN: c.execute(sql, (lid,))
+                                    c.execute(SQL_DELETE_LOTTERY, (lid,))
+                                # 삭제로 비게 된 페이지를 파일에서 회수 (executescript로 실행해야 끝까지 진행됨)
+                                with conn.write_lock: conn.executescript("PRAGMA incremental_vacuum;")
+                                st.cache_data.clear()
+                                st.session_state.view_mode = 'list'; st.session_state.selected_lottery_id = None
+                                st.success("삭제 완료"); time.sleep(1); st.rerun()
+        except (IndexError, pd.errors.EmptyDataError):
+             st.error("추첨을 찾을 수 없습니다."); st.session_state.view_mode = 'list'
+    
+    # ==================== 여기부터 요청대로 수정한 목록 보기 및 페이지네이션 로직 ====================
+    else: 
+        st.header("🎉 추첨 목록")
+        # 1. 전체 개수는 data_version에 이미 들어있는 COUNT(*)를 그대로 사용
+        total_items = version[1]
+        
+        if not total_items:
+            st.info("아직 생성된 추첨이 없습니다.")
+        else:
+            # 2. 페이지네이션 변수 설정
+            ITEMS_PER_PAGE = 10
+            total_pages = (total_items - 1) // ITEMS_PER_PAGE + 1 # math.ceil과 동일한 결과
+
+            # 현재 페이지 번호가 유효 범위를 벗어나면 조정
+            if st.session_state.page_number < 1:
+                st.session_state.page_number = 1
+            if st.session_state.page_number > total_pages:
+                st.session_state.page_number = total_pages
+            
+            # 3. DB에서 현재 페이지에 해당하는 행만 가져오기 (최신순, LIMIT/OFFSET)
+            page_rows = _load_lotteries(st.session_state.page_number, ITEMS_PER_PAGE, version)
+
+            # 4. 현재 페이지의 추첨 목록 표시
+            for row_id, row_title, row_status in page_rows:
+                with st.container(border=True):
+                    list_col1, list_col2, list_col3 = st.columns([5, 2, 2])
+                    status_emoji = "🟢 진행중" if row_status == 'scheduled' else "🏁 완료"
+                    with list_col1: st.write(f"#### {row_title}")
+                    with list_col2: st.markdown(f"**{status_emoji}**")
+                    with list_col3:
+                        if st.button("상세보기", key=f"detail_btn_{row_id}"):
+                            st.session_state.view_mode = 'detail'; st.session_state.selected_lottery_id = row_id; st.rerun()
+            
+            st.markdown("---")
+
+            # 5. 페이지네이션 컨트롤러 (버튼 및 페이지 정보)
+            if total_pages > 1:
+                p_col1, p_col2, p_col3 = st.columns([3, 4, 3])
+                with p_col1:
+                    if st.button("◀ 이전", use_container_width=True, disabled=(st.session_state.page_number <= 1)):
+                        st.session_state.page_number -= 1
+                        st.rerun()
+                with p_col2:
+                    st.markdown(f"<p style='text-align: center; font-size: 18px;'><b>&lt; {st.session_state.page_number} / {total_pages} &gt;</b></p>", unsafe_allow_html=True)
+                with p_col3:
+                    if st.button("다음 ▶", use_container_width=True, disabled=(st.session_state.page_number >= total_pages)):
+                        st.session_state.page_number += 1
+                        st.rerun()
+    # ================================== 수정 끝 ==================================
+
 def main():
     st.set_page_config(page_title="new lottery", page_icon="📜", layout="wide")
-    st_autorefresh(interval=1000, limit=None, key="main_refresher")
-    conn = setup_database()
-    check_and_run_scheduled_draws(conn)
-    check_and_run_scheduled_redraws(conn)
-
-    st.session_state.setdefault('admin_auth', False)
-    st.session_state.setdefault('delete_confirm_id', None)
-    st.session_state.setdefault('view_mode', 'list')
-    st.session_state.setdefault('selected_lottery_id', None)
+    conn = get_conn()
+    st.markdown(WINNER_TAG_CSS, unsafe_allow_html=True)
+
+    # 세션 기본값은 세션의 첫 실행에서 한 번에 채움 (이후 rerun마다 키를 다시 쓰지 않음)
     # 예시 코드에 맞춰 세션 상태 키 이름을 'page_number'로 변경
-    st.session_state.setdefault('page_number', 1)
+    if 'admin_auth' not in st.session_state:
+        st.session_state.update({'admin_auth': False, 'delete_confirm_id': None, 'view_mode': 'list', 'selected_lottery_id': None, 'page_number': 1})
 
     st.title("📜 NEW LOTTERY")
     st.markdown("---")
     col1, col2 = st.columns([2, 1])
 
+    # 목록/상세는 fragment로 그리고, watch_board가 다음 예정 시각에 맞춰(예정된 것이 없으면 REFRESH_MAX초마다) 변경 여부를 확인
     with col1:
-        # 상세 보기 로직 (수정 없음)
-        if st.session_state.view_mode == 'detail' and st.session_state.selected_lottery_id is not None:
-            if st.button("🔙 목록으로 돌아가기"):
-                st.session_state.view_mode = 'list'; st.session_state.selected_lottery_id = None; st.experimental_rerun()
-            
-            lid = st.session_state.selected_lottery_id
-            try:
-                sel_row = pd.read_sql("SELECT * FROM lotteries WHERE id = ?", conn, params=(lid,)).iloc[0]
-                title, status, raw_draw_time = sel_row['title'], sel_row['status'], sel_row['draw_time']
-                
-                if isinstance(raw_draw_time, str): draw_time = datetime.datetime.fromisoformat(raw_draw_time)
-                else: draw_time = raw_draw_time
-                if hasattr(draw_time, 'tzinfo') and draw_time.tzinfo is None: draw_time = draw_time.replace(tzinfo=KST)
+        st.fragment(render_board)(conn)
+        with read_conn() as rconn: every = _refresh_every(rconn, now_kst())
+        st.fragment(watch_board, run_every=every or REFRESH_MAX)(every)
 
-                with st.container(border=True):
-                    st.header(f"✨ {title}")
-                    if status == 'completed':
-                        st.success(f"**추첨 완료!** ({draw_time.strftime('%Y-%m-%d %H:%M:%S %Z')})")
-                        winners_df = pd.read_sql("SELECT winner_name, draw_round FROM winners WHERE lottery_id = ? ORDER BY draw_round", conn, params=(lid,))
-                        for rnd, grp in winners_df.groupby('draw_round'):
-                            label = '1회차' if rnd == 1 else f"{rnd}회차 (재추첨)"
-                            st.markdown(f"#### 🏆 {label} 당첨자")
-                            tags = " &nbsp; ".join([f"<span style='background-color:#E8F5E9; color:#1E8E3E; border-radius:5px; padding:5px 10px; font-weight:bold;'>{n}</span>" for n in grp['winner_name']])
-                            st.markdown(f"<p style='text-align:center; font-size:20px;'>{tags}</p>", unsafe_allow_html=True)
-                        if st.session_state.get(f'celebrated_{lid}', False):
-                            st.balloons(); st.session_state[f'celebrated_{lid}'] = False
-                    else:
-                        diff = draw_time - now_kst()
-                        if diff.total_seconds() > 0: st.info(f"**추첨 예정:** {draw_time.strftime('%Y-%m-%d %H:%M:%S %Z')} (남은 시간: {str(diff).split('.')[0]})")
-                        else: st.warning("예정 시간이 지났습니다. 곧 자동 진행됩니다...")
-                    
-                    redraw_tasks = pd.read_sql("SELECT execution_time, num_winners FROM scheduled_redraws WHERE lottery_id=?", conn, params=(lid,))
-                    for _, task in redraw_tasks.iterrows():
-                        rt = task['execution_time']
-                        if isinstance(rt, str): rt = datetime.datetime.fromisoformat(rt)
-                        if hasattr(rt, 'tzinfo') and rt.tzinfo is None: rt = rt.replace(tzinfo=KST)
-                        st.info(f"**재추첨 예약됨:** {rt.strftime('%Y-%m-%d %H:%M:%S')} ({task['num_winners']}명)")
-                    
-                    tabs = st.tabs(["참가자 명단", "📜 추첨 로그", "👑 관리"])
-                    with tabs[0]:
-                        part_df = pd.read_sql("SELECT name FROM participants WHERE lottery_id = ?", conn, params=(lid,))
-                        st.dataframe(part_df.rename(columns={'name':'이름'}), use_container_width=True, height=200)
-                    with tabs[1]:
-                        log_df = pd.read_sql("SELECT strftime('%Y-%m-%d %H:%M:%S', log_timestamp, 'localtime') AS 시간, log_message AS 내용 FROM lottery_logs WHERE lottery_id = ? ORDER BY id", conn, params=(lid,))
-                        st.dataframe(log_df, use_container_width=True, height=200)
-                    with tabs[2]:
-                        st.subheader("이 추첨 관리하기")
-                        if not st.session_state.admin_auth:
-                            st.warning("관리자 기능을 사용하려면 오른쪽 메뉴에서 인증하세요.")
-                        else:
-                            if status == 'completed':
-                                st.write("**재추첨**")
-                                all_p = pd.read_sql("SELECT name FROM participants WHERE lottery_id=?", conn, params=(lid,))['name'].tolist()
-                                prev = pd.read_sql("SELECT winner_name FROM winners WHERE lottery_id=?", conn, params=(lid,))['winner_name'].tolist()
-                                cand = list(all_p)
-                                for winner in prev:
-                                    if winner in cand: cand.remove(winner)
-                                if cand:
-                                    redraw_type = st.radio("재추첨 방식", ["즉시 추첨", "예약 추첨"], key=f"detail_redraw_type_{lid}", horizontal=True)
-                                    redraw_time = now_kst()
-                                    if redraw_type == "예약 추첨":
-                                        date = st.date_input("날짜", value=now_kst().date(), key=f"detail_redraw_date_{lid}")
-                                        default_tm = st.session_state.get(f'detail_redraw_time_{lid}', (now_kst() + datetime.timedelta(minutes=5)).time())
-                                        tm = st.time_input("시간", value=default_tm, key=f"detail_redraw_time_{lid}", step=datetime.timedelta(minutes=1))
-                                        redraw_time = datetime.datetime.combine(date, tm, tzinfo=KST)
-                                    chosen = st.multiselect("재추첨 후보자", cand, default=cand, key=f"detail_redraw_cand_{lid}")
-                                    num_r = st.number_input("추첨 인원", 1, len(chosen) if chosen else 1, 1, key=f"detail_redraw_num_{lid}")
-                                    if st.button("🚀 재추첨 실행/예약", key=f"detail_redraw_btn_{lid}", type="primary"):
-                                        if not chosen: st.warning("후보자를 선택하세요.")
-                                        elif redraw_type == "예약 추첨" and redraw_time <= now_kst(): st.error("예약 시간은 현재 이후여야 합니다.")
-                                        else:
-                                            if redraw_type == "즉시 추첨":
-                                                run_draw(conn, lid, num_r, chosen); st.success("재추첨 완료"); time.sleep(1); st.experimental_rerun()
-                                            else:
-                                                c = conn.cursor(); candidates_str = ",".join(chosen)
-                                                c.execute("INSERT INTO scheduled_redraws (lottery_id, execution_time, num_winners, candidates) VALUES (?, ?, ?, ?)", (lid, redraw_time, num_r, candidates_str))
-                                                conn.commit(); add_log(conn, lid, f"재추첨 예약됨 ({len(chosen)}명 대상)")
-                                                st.success("재추첨이 예약되었습니다."); time.sleep(1); st.experimental_rerun()
-                                else: st.warning("재추첨 후보가 없습니다.")
-                            else: st.info("완료된 추첨만 재추첨할 수 있습니다.")
-                            st.markdown("---")
-                            st.write("**추첨 삭제**")
-                            if st.button("삭제", key=f"detail_delete_btn_{lid}"): st.session_state.delete_confirm_id = lid
-                            if st.session_state.delete_confirm_id == lid:
-                                st.warning("정말 삭제하시겠습니까?")
-                                if st.button("예, 삭제합니다", key=f"detail_confirm_del_btn_{lid}", type="primary"):
-                                    c = conn.cursor(); c.execute("DELETE FROM lotteries WHERE id=?", (lid,)); conn.commit()
-                                    st.session_state.view_mode = 'list'; st.session_state.selected_lottery_id = None
-                                    st.success("삭제 완료"); time.sleep(1); st.experimental_rerun()
-            except (IndexError, pd.errors.EmptyDataError):
-                 st.error("추첨을 찾을 수 없습니다."); st.session_state.view_mode = 'list'
-        
-        # ==================== 여기부터 요청대로 수정한 목록 보기 및 페이지네이션 로직 ====================
-        else: 
-            st.header("🎉 추첨 목록")
-            # 1. DB에서 모든 데이터를 가져옴 (최신순 정렬)
-            df_lot = pd.read_sql("SELECT id, title, status FROM lotteries ORDER BY id DESC", conn)
-            
-            if df_lot.empty:
-                st.info("아직 생성된 추첨이 없습니다.")
-            else:
-                # 2. 페이지네이션 변수 설정
-                ITEMS_PER_PAGE = 10
-                total_items = len(df_lot)
-                total_pages = (total_items - 1) // ITEMS_PER_PAGE + 1 # math.ceil과 동일한 결과
-
-                # 현재 페이지 번호가 유효 범위를 벗어나면 조정
-                if st.session_state.page_number < 1:
-                    st.session_state.page_number = 1
-                if st.session_state.page_number > total_pages:
-                    st.session_state.page_number = total_pages
-                
-                # 3. 전체 DataFrame에서 현재 페이지에 해당하는 부분만 잘라내기
-                start_idx = (st.session_state.page_number - 1) * ITEMS_PER_PAGE
-                end_idx = start_idx + ITEMS_PER_PAGE
-                df_page = df_lot.iloc[start_idx:end_idx]
-
-                # 4. 현재 페이지의 추첨 목록 표시
-                for _, row in df_page.iterrows():
-                    with st.container(border=True):
-                        list_col1, list_col2, list_col3 = st.columns([5, 2, 2])
-                        status_emoji = "🟢 진행중" if row['status'] == 'scheduled' else "🏁 완료"
-                        with list_col1: st.write(f"#### {row['title']}")
-                        with list_col2: st.markdown(f"**{status_emoji}**")
-                        with list_col3:
-                            if st.button("상세보기", key=f"detail_btn_{row['id']}"):
-                                st.session_state.view_mode = 'detail'; st.session_state.selected_lottery_id = int(row['id']); st.experimental_rerun()
-                
-                st.markdown("---")
-
-                # 5. 페이지네이션 컨트롤러 (버튼 및 페이지 정보)
-                if total_pages > 1:
-                    p_col1, p_col2, p_col3 = st.columns([3, 4, 3])
-                    with p_col1:
-                        if st.button("◀ 이전", use_container_width=True, disabled=(st.session_state.page_number <= 1)):
-                            st.session_state.page_number -= 1
-                            st.experimental_rerun()
-                    with p_col2:
-                        st.markdown(f"<p style='text-align: center; font-size: 18px;'><b>&lt; {st.session_state.page_number} / {total_pages} &gt;</b></p>", unsafe_allow_html=True)
-                    with p_col3:
-                        if st.button("다음 ▶", use_container_width=True, disabled=(st.session_state.page_number >= total_pages)):
-                            st.session_state.page_number += 1
-                            st.experimental_rerun()
-        # ================================== 수정 끝 ==================================
-
-
-    # 관리자 메뉴 (수정 없음)
+    # 관리자 메뉴 (인증, 새 추첨 만들기)
+    now = now_kst()
     with col2:
         st.header("👑 추첨 관리자")
         if not st.session_state.admin_auth:
             pw = st.text_input("관리자 코드", type="password", key="admin_pw_input")
             if st.button("인증", key="auth_button"):
-                if pw == st.secrets.get('admin', {}).get('password'):
-                    st.session_state.admin_auth = True; st.experimental_rerun()
+                if check_admin_password(pw):
+                    st.session_state.admin_auth = True; st.rerun()
                 else: st.error("코드가 올바르지 않습니다.")
         else:
             st.success("관리자로 인증됨")
@@ -267,27 +589,30 @@ def main():
             num_winners = st.number_input("당첨 인원 수", min_value=1, value=1, key="new_num_winners")
             draw_type = st.radio("추첨 방식", ["즉시 추첨", "예약 추첨"], key="new_draw_type", horizontal=True)
             if draw_type == "예약 추첨":
-                date = st.date_input("날짜", value=now_kst().date(), key="new_draw_date")
-                default_tm = st.session_state.get('new_draw_time', (now_kst() + datetime.timedelta(minutes=5)).time())
+                date = st.date_input("날짜", value=now.date(), key="new_draw_date")
+                default_tm = st.session_state.get('new_draw_time', (now + datetime.timedelta(minutes=5)).time())
                 tm = st.time_input("시간 (HH:MM)", value=default_tm, key="new_draw_time", step=datetime.timedelta(minutes=1))
                 draw_time = datetime.datetime.combine(date, tm, tzinfo=KST)
-            else: draw_time = now_kst()
+            else: draw_time = now
             participants_txt = st.text_area("참가자 명단 (한 줄에 한 명)", key="new_participants", height=150)
             if st.button("✅ 추첨 생성", key="create_button", type="primary"):
                 names = [n.strip() for n in participants_txt.split('\n') if n.strip()]
                 if not title or not names: st.warning("제목과 참가자를 입력하세요.")
-                elif draw_type == "예약 추첨" and draw_time <= now_kst(): st.error("예약 시간은 현재 이후여야 합니다.")
+                elif draw_type == "예약 추첨" and draw_time <= now: st.error("예약 시간은 현재 이후여야 합니다.")
                 else:
-                    c = conn.cursor()
-                    c.execute("INSERT INTO lotteries (title, draw_time, num_winners, status) VALUES (?, ?, ?, 'scheduled')", (title, draw_time, num_winners))
-                    lid = c.lastrowid
-                    for n in names: c.execute("INSERT INTO participants (lottery_id, name) VALUES (?, ?)", (lid, n))
-                    conn.commit()
-                    add_log(conn, lid, f"추첨 생성됨 (방식: {draw_type})")
+                    # 추첨/참가자/로그를 한 트랜잭션으로 묶어 한 번만 커밋
+                    with write_tx(conn) as c:
+                        c.execute(SQL_INSERT_LOTTERY, (title, draw_time, num_winners))
+                        lid = c.lastrowid
+                        c.executemany(SQL_INSERT_PARTICIPANT, [(lid, n) for n in names])
+                        add_log(conn, lid, f"추첨 생성됨 (방식: {draw_type})")
+                    # 즉시 추첨은 백그라운드 검사를 기다리지 않고 바로 진행, 예약 추첨은 다음 검사에서 바로 다시 조회하도록
+                    if draw_type == "즉시 추첨": draw_scheduled(conn, lid, num_winners)
+                    else: _sweep_state()['next_due'] = None
+                    st.cache_data.clear()
                     # 새 추첨 생성 후 첫 페이지로 이동
                     st.session_state.page_number = 1
-                    st.success("추첨 생성 완료"); time.sleep(1); st.experimental_rerun()
-    conn.close()
+                    st.success("추첨 생성 완료"); time.sleep(1); st.rerun()
 
 if __name__ == "__main__":
     main()